@@ -7,14 +7,17 @@ Automatically:
 - Creates Year/Month
 - Detects & cleans unemployment rate
 - Builds monthly timeseries
-- Saves: preprocessed CSV, monthly CSV, monthly trend plot
+- Saves: preprocessed data (Parquet by default), monthly CSV, monthly trend plot
 - Silently skips decomposition & boxplot if dataset is too short
 """
 
 import argparse
 import os
+import re
 import sys
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")   # savefig-only, no GUI backend needed
 import matplotlib.pyplot as plt
 
 try:
@@ -24,92 +27,171 @@ except ImportError:
 
 # --------- Helpers ---------
 
+_RATE_STRIP = re.compile(r"[%,\s]")
+
 def clean_rate_series(s):
     """Remove % signs, commas, whitespace and convert to numeric."""
-    s = s.astype(str).str.replace("%", "", regex=False).str.replace(",", "", regex=False).str.strip()
+    if pd.api.types.is_numeric_dtype(s):
+        return pd.to_numeric(s, errors="coerce")
+    s = s.astype(str).str.replace(_RATE_STRIP, "", regex=True)
     return pd.to_numeric(s, errors="coerce")
 
+# (regex, to_datetime format) pairs tried in order on a sample of each column;
+# ambiguous numeric dates are read day-first, as elsewhere in this script
+DATE_FORMATS = [
+    (r"^\d{4}-\d{2}-\d{2}([ T][\d:.]+)?$", "ISO8601"),
+    (r"^\d{1,2}-\d{1,2}-\d{4}$", "%d-%m-%Y"),
+    (r"^\d{1,2}/\d{1,2}/\d{4}$", "%d/%m/%Y"),
+]
+
+def infer_date_format(s, sample_size=100):
+    """Guess a strptime format from the first non-null values of a Series."""
+    sample = s.dropna().astype(str).str.strip().head(sample_size)
+    if sample.empty:
+        return None
+    for pattern, fmt in DATE_FORMATS:
+        if sample.str.match(pattern).mean() > 0.5:
+            return fmt
+    return None
+
+def parse_dates(s, fmt=None):
+    """Parse a Series to datetimes, using an explicit format when one is known."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s    # already parsed on read
+    if pd.api.types.is_string_dtype(s):
+        s = s.str.strip()
+    if fmt:
+        parsed = pd.to_datetime(s, format=fmt, errors="coerce")
+        # the sampled format did not hold for most of the column: parse generically
+        if parsed.notna().sum() >= s.notna().sum() / 2:
+            return parsed
+    return pd.to_datetime(s, dayfirst=True, errors="coerce")
+
+def _fast_read_csv(path, date_col=None):
+    """Read a CSV with the pyarrow engine, falling back to the C engine.
+
+    If date_col is given, it is parsed on read (with an inferred format when
+    possible) instead of in a separate to_datetime pass.
+    """
+    kwargs = {}
+    if date_col:
+        head = pd.read_csv(path, nrows=100)
+        raw = {c.strip(): c for c in head.columns}.get(date_col)
+        fmt = infer_date_format(head[raw]) if raw is not None else None
+        if fmt:
+            # only parse on read when the format holds for the whole sample; otherwise
+            # read_csv would guess (e.g. month-first) and the column is parsed later
+            sample = head[raw].dropna().astype(str).str.strip()
+            if pd.to_datetime(sample, format=fmt, errors="coerce").notna().all():
+                kwargs["parse_dates"] = [raw]
+                kwargs["date_format"] = fmt
+    try:
+        return pd.read_csv(path, engine="pyarrow", **kwargs)
+    except (ImportError, ValueError):
+        return pd.read_csv(path, engine="c", low_memory=False, cache_dates=True, **kwargs)
+
 def detect_date_column(df, provided=None):
+    """Return (column, parsed datetime Series) for the date column."""
     if provided and provided in df.columns:
-        return provided
+        parsed = parse_dates(df[provided], infer_date_format(df[provided]))
+        if parsed.notna().sum() <= len(df) / 4:
+            raise ValueError(f"Could not parse dates in column {provided!r}.")
+        return provided, parsed
 
     candidates = ["Date", "date", "DATE", "Period", "Month"]
     for c in candidates:
         if c in df.columns:
-            try:
-                parsed = pd.to_datetime(df[c], dayfirst=True, errors="coerce")
-                if parsed.notna().sum() > len(df) / 4:
-                    return c
-            except:
-                pass
+            fmt = infer_date_format(df[c])
+            parsed = parse_dates(df[c], fmt)
+            if parsed.notna().sum() > len(df) / 4:
+                return c, parsed
 
     # Auto-detect fallback
     for col in df.columns:
-        if pd.api.types.is_numeric_dtype(df[col]):
+        if col in candidates or pd.api.types.is_numeric_dtype(df[col]):
             continue
-        parsed = pd.to_datetime(df[col], dayfirst=True, errors="coerce")
+        parsed = parse_dates(df[col], infer_date_format(df[col]))
         if parsed.notna().sum() > len(df) / 2:
-            return col
+            return col, parsed
 
     raise ValueError("No usable date column found. Use --date-col DATE.")
 
+RATE_KEYS = ("unemployment", "rate", "estimated unemployment")
+
 def detect_rate_column(df, provided=None):
     if provided and provided in df.columns:
         return provided
 
-    lowered = [c.lower() for c in df.columns]
-    for key in ["unemployment", "rate", "estimated unemployment"]:
-        for c, lc in zip(df.columns, lowered):
-            if key in lc:
-                return c
+    lowered_map = {}
+    for c in df.columns:
+        lowered_map.setdefault(c.lower(), c)   # first column wins on case-only name clashes
+    found = next((lowered_map[lc] for key in RATE_KEYS for lc in lowered_map if key in lc), None)
+    if found is not None:
+        return found
 
-    # fallback: numeric-like column
+    # fallback: numeric-like column, judged from dtype or a small sample only
     for c in df.columns:
-        try:
-            pd.to_numeric(df[c], errors="ignore")
+        if pd.api.types.is_numeric_dtype(df[c]):
             return c
-        except:
-            pass
+        if pd.api.types.is_string_dtype(df[c]):
+            sample = df[c].dropna().head(20)
+            if not sample.empty and clean_rate_series(sample).notna().mean() > 0.8:
+                return c
 
     raise ValueError("Could not detect rate column. Use --rate-col.")
 
 def prepare_dataframe(path, date_col=None, year_col=None, month_col=None, rate_col=None):
-    df = pd.read_csv(path)
+    """Load and clean the CSV; return (df, name of the cleaned rate column)."""
+    df = _fast_read_csv(path, date_col)
     df.columns = [c.strip() for c in df.columns]
 
     # If Year/Month already exist
     if year_col in df.columns and month_col in df.columns:
+        rate_clean = None
         if rate_col and rate_col in df.columns:
-            df[rate_col + "_clean"] = clean_rate_series(df[rate_col])
-        return df
+            rate_clean = rate_col + "_clean"
+            df[rate_clean] = clean_rate_series(df[rate_col])
+        return df, rate_clean
 
-    # Detect date column
-    dcol = detect_date_column(df, date_col)
-    df[dcol] = pd.to_datetime(df[dcol], dayfirst=True, errors="coerce")
-    df["Year"] = df[dcol].dt.year
-    df["Month"] = df[dcol].dt.month
+    # Detect date column (parsed once there, reused here)
+    dcol, parsed = detect_date_column(df, date_col)
+    df[dcol] = parsed
+    # narrow nullable ints: 2 bytes / 1 byte per row instead of int64/float64
+    df["Year"] = parsed.dt.year.astype("Int16")
+    df["Month"] = parsed.dt.month.astype("Int8")
 
     # Detect rate column
     rcol = detect_rate_column(df, rate_col)
-    df[rcol + "_clean"] = clean_rate_series(df[rcol])
+    rate_clean = rcol + "_clean"
+    df[rate_clean] = clean_rate_series(df[rcol])
 
-    return df
+    return df, rate_clean
 
 def monthly_timeseries(df, rate_clean_col):
-    temp = df.dropna(subset=["Year", "Month", rate_clean_col]).copy()
-    temp["day"] = 1
-    temp["dt"] = pd.to_datetime(temp[["Year", "Month", "day"]])
-    temp = temp.set_index("dt")
-    return temp[rate_clean_col].resample("MS").mean()
+    temp = df[["Year", "Month", rate_clean_col]].dropna()
+    grouped = temp.groupby(["Year", "Month"], sort=True, observed=True)[rate_clean_col].mean()
+    # Monthly periods straight from the group keys: no datetime construction,
+    # and they serialize to CSV as plain YYYY-MM strings
+    grouped.index = pd.PeriodIndex.from_fields(
+        year=grouped.index.get_level_values(0).to_numpy("int64"),
+        month=grouped.index.get_level_values(1).to_numpy("int64"),
+        freq="M",
+    ).rename("dt")
+    # keep months without observations as NaN rows, like resample("MS") did
+    if not grouped.empty:
+        full = pd.period_range(grouped.index.min(), grouped.index.max(), freq="M", name="dt")
+        grouped = grouped.reindex(full)
+    return grouped
 
 def plot_monthly(series, outdir):
-    plt.figure(figsize=(10,4))
-    series.plot(title="Monthly Unemployment Rate (aggregated)")
-    plt.xlabel("Date")
-    plt.ylabel("Unemployment rate")
-    plt.tight_layout()
-    plt.savefig(os.path.join(outdir, "monthly_timeseries.png"))
-    plt.close()
+    fig, ax = plt.subplots(figsize=(10,4))
+    ax.plot(series.index.to_timestamp(), series.values)
+    ax.set_title("Monthly Unemployment Rate (aggregated)")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Unemployment rate")
+    fig.tight_layout()
+    fig.savefig(os.path.join(outdir, "monthly_timeseries.png"), dpi=100)
+    plt.close(fig)
 
 # --------- Main ---------
 
@@ -120,21 +202,33 @@ if __name__ == "__main__":
     parser.add_argument("--date-col", help="Date column name")
     parser.add_argument("--rate-col", help="Unemployment rate column name")
     parser.add_argument("--freq", type=int, default=12)
+    parser.add_argument("--preproc-format", choices=["parquet", "csv", "none"], default="parquet",
+                        help="Format for the preprocessed data file (none = don't write it)")
     args = parser.parse_args()
 
     os.makedirs(args.outdir, exist_ok=True)
 
     # FIXED TYPO — using args.date_col instead of args.date
-    df = prepare_dataframe(args.input, args.date_col, None, None, args.rate_col)
-
-    # locate cleaned rate column
-    rate_clean_cols = [c for c in df.columns if c.endswith("_clean")]
-    rate_clean = rate_clean_cols[0]
+    df, rate_clean = prepare_dataframe(args.input, args.date_col, None, None, args.rate_col)
 
-    # Save preprocessed CSV
-    preproc_path = os.path.join(args.outdir, "preprocessed_input.csv")
-    df.to_csv(preproc_path, index=False)
-    print("Saved preprocessed CSV to:", preproc_path)
+    # Save preprocessed data (nothing below reads it back)
+    preproc_format = args.preproc_format
+    if preproc_format == "parquet":
+        preproc_path = os.path.join(args.outdir, "preprocessed_input.parquet")
+        try:
+            df.to_parquet(preproc_path, compression="zstd", index=False)
+            print("Saved preprocessed Parquet to:", preproc_path)
+        except ImportError:
+            print("No Parquet engine installed (pyarrow/fastparquet); writing CSV instead.")
+            preproc_format = "csv"
+    if preproc_format == "csv":
+        preproc_path = os.path.join(args.outdir, "preprocessed_input.csv")
+        try:
+            from pyarrow import csv as pacsv, Table
+            pacsv.write_csv(Table.from_pandas(df, preserve_index=False), preproc_path)
+        except (ImportError, ValueError, TypeError):   # no pyarrow, or a column Arrow cannot convert
+            df.to_csv(preproc_path, index=False)
+        print("Saved preprocessed CSV to:", preproc_path)
 
     # Monthly TS
     monthly = monthly_timeseries(df, rate_clean)
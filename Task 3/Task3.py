@@ -4,27 +4,44 @@ Task3.py - Car price prediction script (robust target detection)
 
 Usage examples:
   python Task3.py -i "car data.csv" -o results    # will auto-detect target from common names
+
+The model is saved uncompressed, so it can be reloaded memory-mapped:
+  model = joblib.load("results/rf_model.joblib", mmap_mode="r")
 """
 
 import argparse
 import sys
 import os
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import ShuffleSplit
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
+from sklearn import config_context
 
 COMMON_TARGET_ALIASES = [
     "price", "Price", "selling_price", "Selling_Price", "selling price",
     "Selling Price", "target", "y", "label"
 ]
 
+# categorical fields with more distinct values than this get sparse dummy columns
+SPARSE_DUMMY_LEVELS = 50
+# HistGradientBoosting can treat at most max_bins (default 255) levels as categorical
+HGB_MAX_CATEGORIES = 255
+
+def _fast_read_csv(path):
+    """Read a CSV with the pyarrow engine, falling back to the C engine."""
+    try:
+        return pd.read_csv(path, engine="pyarrow")
+    except (ImportError, ValueError):
+        return pd.read_csv(path, engine="c", low_memory=False, cache_dates=True)
+
 def find_target_column(df, requested):
+    # normalized name -> original column (case-insensitive, underscores vs spaces)
+    candidates = {c.lower().replace(" ", "_"): c for c in df.columns}
     # If user explicitly requested a column and it exists, use it
     if requested:
-        # allow case-insensitive match and also match underscores vs spaces
-        candidates = {c.lower().replace(" ", "_"): c for c in df.columns}
         key = requested.lower().replace(" ", "_")
         if key in candidates:
             return candidates[key]
@@ -32,33 +49,47 @@ def find_target_column(df, requested):
         if requested in df.columns:
             return requested
     # Try common aliases
-    candidates = {c.lower().replace(" ", "_"): c for c in df.columns}
     for alias in COMMON_TARGET_ALIASES:
         k = alias.lower().replace(" ", "_")
         if k in candidates:
             return candidates[k]
     return None
 
-def basic_preprocess(df, target_col):
+def basic_preprocess(df, target_col, one_hot=True):
     # simple preprocessing: drop rows with no target, basic dummies for categoricals
-    df = df.copy()
-    df = df.dropna(subset=[target_col])
-    # drop obviously non-feature columns if present
-    drop_cols = []
-    # preserve numeric features and create dummies for categoricals
-    for c in df.columns:
-        if c == target_col:
-            continue
-        if df[c].dtype == 'O' or df[c].dtype.name == 'category':
-            # if textual but likely identifier (Car_Name), drop it
-            if c.lower() in ("car_name", "name", "id"):
-                drop_cols.append(c)
-    if drop_cols:
-        df = df.drop(columns=drop_cols)
-    # One-hot encode categorical features
-    df = pd.get_dummies(df, drop_first=True)
+    # (or, with one_hot=False, category-dtype columns for native categorical support)
+    def is_categorical(c):
+        return pd.api.types.is_string_dtype(df[c]) or df[c].dtype.name == 'category'
+
+    # drop obviously non-feature columns (textual identifiers like Car_Name) and
+    # rows with no target in a single selection, instead of copy -> dropna -> drop
+    keep = [c for c in df.columns
+            if c == target_col or not (is_categorical(c) and c.lower() in ("car_name", "name", "id"))]
+    df = df.loc[df[target_col].notna(), keep]
+    cat_cols = [c for c in df.columns if c != target_col and is_categorical(c)]
+    if not one_hot:
+        return df.astype({c: "category" for c in cat_cols})
+    # One-hot encode categorical features (uint8; sparse if a retained field has many levels).
+    # Stay dense when other features have NaN: RandomForest handles NaN on dense input only.
+    num_cols = [c for c in df.columns if c != target_col and c not in cat_cols]
+    sparse = (any(df[c].nunique() > SPARSE_DUMMY_LEVELS for c in cat_cols)
+              and not df[num_cols].isna().any().any())
+    df = pd.get_dummies(df, drop_first=True, dtype="uint8", sparse=sparse)
     return df
 
+def get_split(path, n_samples, test_size, random_state):
+    # reuse saved train/test indices if they were made for the same data size and settings
+    if os.path.exists(path):
+        with np.load(path) as saved:
+            if (int(saved["n_samples"]) == n_samples and float(saved["test_size"]) == test_size
+                    and int(saved["random_state"]) == random_state):
+                return saved["train"], saved["test"]
+    splitter = ShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
+    train_idx, test_idx = next(splitter.split(np.empty((n_samples, 1))))
+    np.savez_compressed(path, train=train_idx, test=test_idx, n_samples=n_samples,
+                        test_size=test_size, random_state=random_state)
+    return train_idx, test_idx
+
 def main():
     parser = argparse.ArgumentParser(description="Task3: Car price prediction")
     parser.add_argument("-i", "--input", required=True, help="Input CSV file")
@@ -66,6 +97,8 @@ def main():
     parser.add_argument("--target", default=None, help="Target column name (optional)")
     parser.add_argument("--test-size", type=float, default=0.2, help="Test split fraction")
     parser.add_argument("--random-state", type=int, default=42, help="Random state for reproducibility")
+    parser.add_argument("--model", choices=["rf", "hgb"], default="rf",
+                        help="rf = RandomForestRegressor (default), hgb = HistGradientBoostingRegressor")
     args = parser.parse_args()
 
     if not os.path.exists(args.input):
@@ -73,7 +106,7 @@ def main():
         sys.exit(1)
 
     print("Loading data...", args.input)
-    df = pd.read_csv(args.input)
+    df = _fast_read_csv(args.input)
     print("Rows/cols:", df.shape)
 
     # find a target column
@@ -88,7 +121,7 @@ def main():
     print("Using target column:", target_col)
 
     # prepare data
-    df_proc = basic_preprocess(df, target_col)
+    df_proc = basic_preprocess(df, target_col, one_hot=(args.model == "rf"))
     if target_col not in df_proc.columns:
         # If the preprocessing dropped the original name (e.g., it had spaces),
         # try to locate the numeric target column by similarity
@@ -104,27 +137,67 @@ def main():
     # split X/y
     X = df_proc.drop(columns=[target_col])
     y = df_proc[target_col]
-
-    # simple train/test split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size, random_state=args.random_state)
+    cat_features = []
+    if args.model == "hgb":
+        # replace category columns by their integer codes (-1 = missing)
+        for i, c in enumerate(X.columns):
+            if X[c].dtype.name == "category":
+                if len(X[c].cat.categories) <= HGB_MAX_CATEGORIES:
+                    cat_features.append(i)
+                # too many levels for native support: keep the codes as an ordinal feature
+                X[c] = X[c].cat.codes
+    # hand sklearn plain arrays; column names are kept separately for inference
+    feature_names = list(X.columns)
+    if any(isinstance(dt, pd.SparseDtype) for dt in X.dtypes):
+        # sparse dummies -> CSR matrix, which RandomForestRegressor accepts directly
+        X_arr = X.astype(pd.SparseDtype("float64", 0)).sparse.to_coo().tocsr()
+    else:
+        X_arr = X.to_numpy(copy=False)
+    y_arr = y.to_numpy(copy=False)
+
+    # simple train/test split (indices persisted in split.npz)
+    os.makedirs(args.outdir, exist_ok=True)
+    split_path = os.path.join(args.outdir, "split.npz")
+    train_idx, test_idx = get_split(split_path, X_arr.shape[0], args.test_size, args.random_state)
+    X_train, X_test = X_arr[train_idx], X_arr[test_idx]
+    y_train, y_test = y_arr[train_idx], y_arr[test_idx]
     print("Train/test sizes:", X_train.shape[0], X_test.shape[0])
 
-    # simple model (RandomForest)
-    print("Training RandomForestRegressor...")
-    model = RandomForestRegressor(n_estimators=100, random_state=args.random_state)
+    if args.model == "hgb":
+        print("Training HistGradientBoostingRegressor...")
+        model = HistGradientBoostingRegressor(max_iter=200, learning_rate=0.1, random_state=args.random_state,
+                                              early_stopping="auto", categorical_features=cat_features or None)
+    else:
+        # simple model (RandomForest)
+        print("Training RandomForestRegressor...")
+        # trees are independent, so fit (and predict) them on all cores
+        model = RandomForestRegressor(n_estimators=100, random_state=args.random_state, n_jobs=-1)
     model.fit(X_train, y_train)
 
     # evaluate
-    preds = model.predict(X_test)
+    if args.model == "rf":
+        # forest trees compare in float32 anyway; casting up front halves the bytes read
+        X_test = X_test.astype(np.float32, copy=False)
+    if isinstance(X_test, np.ndarray):
+        # dense features went through the same validation at fit time, so skip
+        # the NaN/inf scan on predict (the sparse path keeps sklearn's checks)
+        with config_context(assume_finite=True):
+            preds = model.predict(X_test)
+    else:
+        preds = model.predict(X_test)
     mse = mean_squared_error(y_test, preds)
     r2 = r2_score(y_test, preds)
     print(f"Test MSE: {mse:.4f}, R2: {r2:.4f}")
 
     # save outputs
-    os.makedirs(args.outdir, exist_ok=True)
-    model_path = os.path.join(args.outdir, "rf_model.joblib")
-    joblib.dump(model, model_path)
+    model_path = os.path.join(args.outdir, f"{args.model}_model.joblib")
+    # uncompressed on purpose: lets joblib.load(model_path, mmap_mode="r") page arrays in from the file
+    joblib.dump(model, model_path, compress=0, protocol=5)
     print("Saved model to:", model_path)
+    features_path = os.path.join(args.outdir, "feature_names.txt")
+    with open(features_path, "w") as f:
+        f.write("\n".join(feature_names) + "\n")
+    print("Saved feature names to:", features_path)
 
     # save metrics
     metrics_path = os.path.join(args.outdir, "metrics.txt")